@@ -3,15 +3,27 @@ Fraud Detection Agents using CrewAI
 """
 
 from crewai import Agent, Task, Crew
+from app.agents.prompts import AGENT_PROMPTS
 from app.config.settings import settings
 import json
+import re
+import threading
+import time
+from functools import partial
 
 
 class FraudDetectionAgents:
     """Collection of AI agents for fraud detection"""
     
     def __init__(self):
+        self.verbose = settings.AGENT_VERBOSE
+        self._lock = threading.Lock()
+        self._verbose_lock = threading.Lock()
+        # Per-kickoff timing state, only touched while holding _lock
+        self._trace = None
+        self._task_clock = None
         self.agents = self._create_agents()
+        self.tasks = self._create_tasks()
         self.crew = self._create_crew()
     
     def _create_agents(self):
@@ -22,7 +34,7 @@ class FraudDetectionAgents:
             role="Amount Analysis Specialist",
             goal="Analyze transaction amounts for unusual patterns",
             backstory="You are an expert in detecting unusual spending patterns and amount-based fraud indicators.",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False
         )
         
@@ -31,7 +43,7 @@ class FraudDetectionAgents:
             role="Behavioral Analysis Specialist",
             goal="Analyze user behavior patterns for anomalies",
             backstory="You specialize in understanding normal vs abnormal user transaction behaviors.",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False
         )
         
@@ -40,7 +52,7 @@ class FraudDetectionAgents:
             role="Location Analysis Specialist",
             goal="Analyze transaction locations for suspicious activities",
             backstory="You are an expert in geographic fraud patterns and location-based risk assessment.",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False
         )
         
@@ -49,7 +61,7 @@ class FraudDetectionAgents:
             role="Risk Assessment Coordinator",
             goal="Coordinate all analysis and make final fraud determination",
             backstory="You are the final decision maker who weighs all evidence from other agents.",
-            verbose=True,
+            verbose=self.verbose,
             allow_delegation=False
         )
         
@@ -64,115 +76,181 @@ class FraudDetectionAgents:
         """Create the crew of agents"""
         return Crew(
             agents=list(self.agents.values()),
-            verbose=True
+            tasks=list(self.tasks.values()),
+            verbose=self.verbose
         )
     
-    def analyze_transaction(self, transaction_data):
-        """Analyze a transaction using all agents"""
-        
-        # Create tasks for each agent
-        tasks = []
-        
-        # Amount analysis task
-        amount_task = Task(
-            description=f"""
-            Analyze the transaction amount: ${transaction_data['amount']}
-            Transaction type: {transaction_data['transaction_type']}
-            User ID: {transaction_data['user_id']}
-            
-            Look for:
-            - Unusually high amounts
-            - Round number patterns
-            - Amounts that don't match typical patterns
-            
-            Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
-            """,
-            agent=self.agents['amount']
-        )
-        
-        # Behavior analysis task
-        behavior_task = Task(
-            description=f"""
-            Analyze the transaction behavior:
-            User ID: {transaction_data['user_id']}
-            Transaction type: {transaction_data['transaction_type']}
-            Time: {transaction_data['timestamp']}
-            
-            Look for:
-            - Unusual transaction timing
-            - Frequency patterns
-            - Transaction type patterns
-            
-            Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
-            """,
-            agent=self.agents['behavior']
+    def _create_tasks(self):
+        """Create the reusable task for each agent
+
+        Descriptions are filled in from the prompt templates on each request.
+        """
+        expected_outputs = {
+            'amount': "SUSPICIOUS or NORMAL with reasoning",
+            'behavior': "SUSPICIOUS or NORMAL with reasoning",
+            'location': "SUSPICIOUS or NORMAL with reasoning",
+            'risk': "FRAUD or LEGITIMATE verdict, confidence score (0-1) and key risk factors"
+        }
+        tasks = {}
+        for name in ['amount', 'behavior', 'location']:
+            tasks[name] = Task(
+                description=AGENT_PROMPTS[name].body,
+                expected_output=expected_outputs[name],
+                agent=self.agents[name],
+                callback=partial(self._on_task_done, name)
+            )
+        tasks['risk'] = Task(
+            description=AGENT_PROMPTS['risk'].body,
+            expected_output=expected_outputs['risk'],
+            agent=self.agents['risk'],
+            context=[tasks['amount'], tasks['behavior'], tasks['location']],
+            callback=partial(self._on_task_done, 'risk')
         )
+        return tasks
+    
+    def _on_task_done(self, name, task_output):
+        """Record how long a task took on the current request's trace
+
+        Tasks run sequentially, so each one took the time since the previous
+        task finished (or since kickoff for the first task).
+        """
+        now = time.perf_counter()
+        if self._trace is not None and self._task_clock is not None:
+            self._trace.add_step(f"agents.{name}", (now - self._task_clock) * 1000)
+        self._task_clock = now
+    
+    def set_verbose(self, enabled):
+        """Switch agent and crew tracing on or off at runtime
+
+        Agent executors pick up ``agent.verbose`` on every kickoff, but the
+        crew's logger is fixed when the crew is built, so the crew is rebuilt.
+        A kickoff already in progress keeps the old crew.
+        """
+        with self._verbose_lock:
+            self.verbose = bool(enabled)
+            for agent in self.agents.values():
+                agent.verbose = self.verbose
+            self.crew = self._create_crew()
+    
+    def build_prompts(self, transaction_data):
+        """Render the prompt for each agent within the token budget"""
+        values = {
+            'amount': transaction_data['amount'],
+            'transaction_type': transaction_data['transaction_type'],
+            'user_id': transaction_data['user_id'],
+            'timestamp': transaction_data['timestamp'],
+            'location': transaction_data.get('location') or 'Unknown',
+            'merchant': transaction_data.get('merchant') or 'Unknown'
+        }
+        context = self._build_context(transaction_data)
         
-        # Location analysis task
-        location_task = Task(
-            description=f"""
-            Analyze the transaction location:
-            Location: {transaction_data.get('location', 'Unknown')}
-            Merchant: {transaction_data.get('merchant', 'Unknown')}
-            User ID: {transaction_data['user_id']}
-            
-            Look for:
-            - Unusual locations
-            - High-risk merchants
-            - Geographic inconsistencies
-            
-            Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
-            """,
-            agent=self.agents['location']
-        )
+        return {
+            name: template.render(values, context, settings.PROMPT_TOKEN_BUDGET)
+            for name, template in AGENT_PROMPTS.items()
+        }
+    
+    def _build_context(self, transaction_data):
+        """Format optional context sections as prompt lines"""
+        history = []
+        for past in transaction_data.get('history') or []:
+            line = f"{past['timestamp']} {past['transaction_type']} ${past['amount']}"
+            if past.get('merchant'):
+                line += f" at {past['merchant']}"
+            if past.get('location'):
+                line += f" ({past['location']})"
+            if past.get('is_fraud') is not None:
+                line += " [FRAUD]" if past['is_fraud'] else " [LEGITIMATE]"
+            history.append(line)
         
-        # Risk assessment task
-        risk_task = Task(
-            description=f"""
-            Based on all previous analyses, make a final fraud determination.
-            
-            Consider:
-            - Amount analysis results
-            - Behavior analysis results
-            - Location analysis results
-            
-            Provide final verdict: FRAUD or LEGITIMATE
-            Include confidence score (0-1)
-            List key risk factors
-            """,
-            agent=self.agents['risk']
-        )
+        metadata = []
+        if settings.PROMPT_INCLUDE_METADATA:
+            metadata = [
+                f"{key}: {value}"
+                for key, value in (transaction_data.get('metadata') or {}).items()
+            ]
         
-        tasks = [amount_task, behavior_task, location_task, risk_task]
+        risk_index = []
+        risk_profile = transaction_data.get('risk_profile') or {}
+        for label, key in [('Merchant', 'merchant'), ('Location', 'location'),
+                           ('Merchant at location', 'pair')]:
+            stats = risk_profile.get(key)
+            if stats:
+                risk_index.append(
+                    f"{label}: {stats['fraud_rate']:.0%} fraud rate over {stats['volume']} transactions"
+                )
+            listed_rate = (risk_profile.get('listed') or {}).get(key)
+            if listed_rate is not None:
+                risk_index.append(f"{label}: {listed_rate:.0%} fraud rate on the risk list")
         
-        # Execute the crew
-        result = self.crew.kickoff(tasks=tasks)
+        return {
+            'history': history,
+            'risk_index': risk_index,
+            'metadata': metadata,
+            'similar_cases': list(transaction_data.get('similar_cases') or [])
+        }
+    
+    def analyze_transaction(self, transaction_data, trace=None):
+        """Analyze a transaction using all agents
+
+        If a trace is given, prompt building and each task are recorded on
+        it as separate steps.
+        """
+        with self._lock:
+            build_start = time.perf_counter()
+            prompts = self.build_prompts(transaction_data)
+            for name, prompt in prompts.items():
+                self.tasks[name].description = prompt
+            prompt_build_ms = (time.perf_counter() - build_start) * 1000
+            if trace is not None:
+                trace.add_step("agents.prompt_build", prompt_build_ms)
+            
+            # Execute the crew; the agents' token counters are cumulative
+            tokens_before = self.crew.calculate_usage_metrics()['prompt_tokens']
+            self._trace, self._task_clock = trace, time.perf_counter()
+            try:
+                result = self.crew.kickoff()
+            finally:
+                self._trace, self._task_clock = None, None
+            prompt_tokens = self.crew.calculate_usage_metrics()['prompt_tokens'] - tokens_before
         
-        return self._process_results(result)
+        analysis = self._process_results(result)
+        analysis['prompt_tokens'] = prompt_tokens
+        analysis['prompt_build_ms'] = round(prompt_build_ms, 3)
+        return analysis
     
     def _process_results(self, crew_result):
-        """Process crew results into structured format"""
-        # Simple processing - in a real implementation, this would be more sophisticated
+        """Process crew results into structured format
+
+        Each analysis task is read for a SUSPICIOUS or NORMAL vote and the
+        risk task for its FRAUD or LEGITIMATE verdict, matching whole words
+        only so phrases like "no indicators of fraud" are not read as FRAUD.
+        """
         result_text = str(crew_result)
+        task_outputs = [output.raw for output in getattr(crew_result, 'tasks_output', None) or []]
+        if len(task_outputs) == len(self.tasks):
+            outputs = dict(zip(self.tasks, task_outputs))
+        else:
+            outputs = {name: "" for name in self.tasks}
+            outputs['risk'] = result_text
         
-        # Basic fraud detection logic based on agent responses
-        is_fraud = "FRAUD" in result_text.upper()
-        confidence = 0.8 if is_fraud else 0.2
+        verdict = self._parse_verdict(outputs['risk'])
+        if verdict is None:
+            raise ValueError("Risk agent did not return a FRAUD or LEGITIMATE verdict")
+        is_fraud = verdict == "FRAUD"
         
-        # Extract risk factors (simplified)
-        risk_factors = []
-        if "suspicious" in result_text.lower():
-            risk_factors.append("Suspicious patterns detected")
-        if "unusual" in result_text.lower():
-            risk_factors.append("Unusual behavior")
+        confidence = self._parse_confidence(outputs['risk'])
+        if confidence is None:
+            confidence = 0.8 if is_fraud else 0.2
         
-        # Agent votes (simplified)
         agent_votes = {
-            "amount_agent": "SUSPICIOUS" in result_text,
-            "behavior_agent": "SUSPICIOUS" in result_text,
-            "location_agent": "SUSPICIOUS" in result_text,
-            "risk_agent": is_fraud
+            f"{name}_agent": self._parse_vote(outputs[name]) == "SUSPICIOUS"
+            for name in ['amount', 'behavior', 'location']
         }
+        agent_votes["risk_agent"] = is_fraud
+        
+        risk_factors = self._parse_risk_factors(outputs['risk'])
+        if not risk_factors and any(agent_votes[f"{name}_agent"] for name in ['amount', 'behavior', 'location']):
+            risk_factors.append("Suspicious patterns detected")
         
         return {
             "is_fraud": is_fraud,
@@ -180,4 +258,55 @@ class FraudDetectionAgents:
             "risk_factors": risk_factors,
             "agent_votes": agent_votes,
             "raw_analysis": result_text
-        } 
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def _parse_verdict(text):
+        """Get FRAUD or LEGITIMATE from the risk agent's verdict"""
+        match = re.search(r"verdict\W*(FRAUD|LEGITIMATE)\b", text, re.IGNORECASE)
+        if match:
+            return match.group(1).upper()
+        # Otherwise the first upper-case verdict word, as the prompt asks for
+        match = re.search(r"\b(FRAUD|LEGITIMATE)\b", text)
+        return match.group(1) if match else None
+    
+    @staticmethod
+    def _parse_vote(text):
+        """Get the first SUSPICIOUS or NORMAL vote from an analysis"""
+        match = re.search(r"\b(SUSPICIOUS|NORMAL)\b", text, re.IGNORECASE)
+        return match.group(1).upper() if match else None
+    
+    @staticmethod
+    def _parse_confidence(text):
+        """Get the confidence score (0-1) from the risk agent's answer"""
+        for line in text.splitlines():
+            if "confidence" not in line.lower():
+                continue
+            # Last number on the line, so "(0-1): 0.85" reads as 0.85
+            numbers = re.findall(r"(\d+(?:\.\d+)?)(%?)", line)
+            if not numbers:
+                continue
+            value, percent = numbers[-1]
+            value = float(value) / 100 if percent else float(value)
+            if 0 <= value <= 1:
+                return value
+        return None
+    
+    @staticmethod
+    def _parse_risk_factors(text):
+        """Get the bullet points listed under the risk factors heading"""
+        factors = []
+        in_factors = False
+        for line in text.splitlines():
+            stripped = line.strip()
+            if "risk factor" in stripped.lower():
+                in_factors = True
+                continue
+            if not in_factors:
+                continue
+            match = re.match(r"^(?:[-*\u2022]|\d+[.)])\s+(.+)$", stripped)
+            if match:
+                factors.append(match.group(1).strip())
+            elif stripped:
+                break
+        return factors
@@ -0,0 +1,159 @@
+"""
+Prompt templates for fraud detection agents
+"""
+
+import textwrap
+
+# Rough chars-per-token ratio for llama-style tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class PromptTemplate:
+    """Precompiled agent prompt with optional context sections
+
+    The body is always rendered in full. Context sections are appended in
+    priority order (lowest number first) for as long as they fit in the
+    token budget; a section that only partially fits is cut line by line.
+    """
+
+    def __init__(self, name, body, sections=None):
+        self.name = name
+        self.body = textwrap.dedent(body).strip()
+        # sections: list of (priority, key, title)
+        self.sections = sorted(sections or [], key=lambda section: section[0])
+
+    def render(self, values, context, token_budget):
+        """Render the prompt, trimming context sections to fit the budget"""
+        prompt = self.body.format(**values)
+        remaining = token_budget - estimate_tokens(prompt)
+
+        blocks = []
+        for _, key, title in self.sections:
+            lines = context.get(key) or []
+            block = self._fit_section(title, lines, remaining)
+            if block:
+                blocks.append(block)
+                remaining -= estimate_tokens(block) + 1
+
+        if blocks:
+            prompt = prompt + "\n\n" + "\n\n".join(blocks)
+        return prompt
+
+    @staticmethod
+    def _fit_section(title, lines, remaining):
+        """Keep as many leading lines of a section as the budget allows"""
+        header = f"{title}:"
+        used = estimate_tokens(header)
+        kept = []
+        for line in lines:
+            entry = f"- {line}"
+            cost = estimate_tokens(entry) + 1
+            if used + cost > remaining:
+                break
+            kept.append(entry)
+            used += cost
+
+        if not kept:
+            return ""
+        return "\n".join([header] + kept)
+
+
+# Section priorities: lower numbers are kept first when the budget is tight
+AMOUNT_PROMPT = PromptTemplate(
+    "amount",
+    """
+    Analyze the transaction amount: ${amount}
+    Transaction type: {transaction_type}
+    User ID: {user_id}
+
+    Look for:
+    - Unusually high amounts
+    - Round number patterns
+    - Amounts that don't match typical patterns
+
+    Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
+    """,
+    sections=[
+        (1, "history", "Recent transactions for this user"),
+        (2, "similar_cases", "Similar past cases"),
+        (3, "metadata", "Transaction metadata"),
+    ]
+)
+
+BEHAVIOR_PROMPT = PromptTemplate(
+    "behavior",
+    """
+    Analyze the transaction behavior:
+    User ID: {user_id}
+    Transaction type: {transaction_type}
+    Time: {timestamp}
+
+    Look for:
+    - Unusual transaction timing
+    - Frequency patterns
+    - Transaction type patterns
+
+    Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
+    """,
+    sections=[
+        (1, "history", "Recent transactions for this user"),
+        (2, "metadata", "Transaction metadata"),
+        (3, "similar_cases", "Similar past cases"),
+    ]
+)
+
+LOCATION_PROMPT = PromptTemplate(
+    "location",
+    """
+    Analyze the transaction location:
+    Location: {location}
+    Merchant: {merchant}
+    User ID: {user_id}
+
+    Look for:
+    - Unusual locations
+    - High-risk merchants
+    - Geographic inconsistencies
+
+    Return your analysis as: SUSPICIOUS or NORMAL with reasoning.
+    """,
+    sections=[
+        (0, "risk_index", "Known merchant and location risk"),
+        (1, "history", "Recent transactions for this user"),
+        (2, "similar_cases", "Similar past cases"),
+        (3, "metadata", "Transaction metadata"),
+    ]
+)
+
+RISK_PROMPT = PromptTemplate(
+    "risk",
+    """
+    Based on all previous analyses, make a final fraud determination.
+
+    Consider:
+    - Amount analysis results
+    - Behavior analysis results
+    - Location analysis results
+
+    Provide final verdict: FRAUD or LEGITIMATE
+    Include confidence score (0-1)
+    List key risk factors
+    """,
+    sections=[
+        (1, "similar_cases", "Similar past cases"),
+    ]
+)
+
+AGENT_PROMPTS = {
+    'amount': AMOUNT_PROMPT,
+    'behavior': BEHAVIOR_PROMPT,
+    'location': LOCATION_PROMPT,
+    'risk': RISK_PROMPT
+}
@@ -2,8 +2,12 @@
 FastAPI routes for fraud detection
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
 from datetime import datetime
+from typing import Optional
+import hmac
 import uuid
 
 from app.models.schemas import (
@@ -13,6 +17,8 @@ from app.models.schemas import (
     TransactionType
 )
 from app.services.fraud_service import FraudDetectionService
+from app.services.profiling import SamplingProfiler
+from app.config.settings import settings
 
 # Create router
 router = APIRouter()
@@ -20,6 +26,19 @@ router = APIRouter()
 # Initialize fraud detection service
 fraud_service = FraudDetectionService()
 
+# Initialize on-demand profiler
+profiler = SamplingProfiler()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Only allow requests carrying the configured admin token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), settings.ADMIN_TOKEN.encode()
+    ):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
 
 @router.post("/analyze", response_model=FraudAnalysisResponse)
 async def analyze_transaction(request: FraudAnalysisRequest):
@@ -71,6 +90,33 @@ async def quick_test():
     }
 
 
+@router.post("/admin/profile", response_class=PlainTextResponse,
+             dependencies=[Depends(require_admin)])
+async def profile(seconds: int = Query(10, ge=1)):
+    """Sample all threads for N seconds and return collapsed stacks"""
+    seconds = min(seconds, settings.PROFILER_MAX_SECONDS)
+    try:
+        return await run_in_threadpool(profiler.profile, seconds)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/admin/slow-requests", dependencies=[Depends(require_admin)])
+async def slow_requests(limit: int = Query(20, ge=1)):
+    """Get step timing traces of recent slow requests"""
+    return {
+        "threshold_ms": fraud_service.slow_requests.threshold_ms,
+        "requests": fraud_service.slow_requests.recent(limit)
+    }
+
+
+@router.post("/admin/agents/verbose", dependencies=[Depends(require_admin)])
+async def set_agent_verbose(enabled: bool):
+    """Switch agent verbose tracing on or off"""
+    await run_in_threadpool(fraud_service.agents.set_verbose, enabled)
+    return {"verbose": fraud_service.agents.verbose}
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
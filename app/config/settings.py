@@ -23,9 +23,27 @@ class Settings:
     OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
     OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama2")
     
+    # Agents
+    AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "false").lower() == "true"
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "384"))  # per agent prompt
+    # Extra prompt context; off by default since every token adds LLM latency
+    PROMPT_HISTORY_LIMIT = int(os.getenv("PROMPT_HISTORY_LIMIT", "0"))
+    PROMPT_INCLUDE_METADATA = os.getenv("PROMPT_INCLUDE_METADATA", "false").lower() == "true"
+    
     # Fraud Detection
     FRAUD_THRESHOLD = float(os.getenv("FRAUD_THRESHOLD", "0.7"))
     MAX_RESPONSE_TIME = int(os.getenv("MAX_RESPONSE_TIME", "500"))  # milliseconds
+    
+    # Merchant and location risk index
+    RISK_INDEX_STATIC_PATH = os.getenv("RISK_INDEX_STATIC_PATH", "")  # optional JSON list
+    RISK_INDEX_FRAUD_RATE = float(os.getenv("RISK_INDEX_FRAUD_RATE", "0.5"))
+    RISK_INDEX_MIN_VOLUME = int(os.getenv("RISK_INDEX_MIN_VOLUME", "5"))
+    
+    # Admin and profiling
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # admin endpoints are disabled when empty
+    PROFILER_MAX_SECONDS = int(os.getenv("PROFILER_MAX_SECONDS", "60"))
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "2000"))
+    SLOW_REQUEST_BUFFER_SIZE = int(os.getenv("SLOW_REQUEST_BUFFER_SIZE", "100"))
 
 
 # Global settings instance
@@ -35,6 +35,8 @@ class FraudPrediction(BaseModel):
     risk_factors: list[str]
     agent_votes: Dict[str, bool]
     processing_time_ms: int
+    prompt_tokens: Optional[int] = None
+    prompt_build_ms: Optional[float] = None
 
 
 class FraudAnalysisRequest(BaseModel):
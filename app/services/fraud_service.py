@@ -8,6 +8,8 @@ from datetime import datetime
 from typing import Dict, Any
 
 from app.agents.fraud_agents import FraudDetectionAgents
+from app.services.risk_index import RiskIndex
+from app.services.profiling import RequestTrace, SlowRequestLog
 from app.models.schemas import Transaction, FraudPrediction
 from app.database.database import get_db, TransactionRecord, FraudAnalysisRecord
 from app.config.settings import settings
@@ -18,11 +20,35 @@ class FraudDetectionService:
     
     def __init__(self):
         self.agents = FraudDetectionAgents()
+        self.risk_index = RiskIndex()  # built on startup, once tables exist
+        self.slow_requests = SlowRequestLog()
     
     async def analyze_transaction(self, transaction: Transaction) -> FraudPrediction:
         """Analyze a transaction for fraud"""
+        trace = RequestTrace(transaction.transaction_id)
+        try:
+            return await self._analyze(transaction, trace)
+        finally:
+            # Keep the step timings of slow requests for later inspection
+            self.slow_requests.record(trace.finish())
+    
+    async def _analyze(self, transaction: Transaction, trace: RequestTrace) -> FraudPrediction:
+        """Run the analysis steps, timing each one on the trace"""
         start_time = time.time()
         
+        # Known-bad merchants and locations don't need the agents
+        with trace.step("risk_index"):
+            risk_profile = self.risk_index.lookup(transaction.merchant, transaction.location)
+        if risk_profile['known_bad']:
+            with trace.step("fallback"):
+                prediction = self._fallback_analysis(transaction, start_time, risk_profile)
+            with trace.step("store"):
+                await self._store_analysis_result(transaction, prediction, update_index=False)
+            return prediction
+        
+        with trace.step("history"):
+            history = self._get_user_history(transaction.user_id)
+        
         # Convert transaction to dict for agents
         transaction_data = {
             'transaction_id': transaction.transaction_id,
@@ -32,12 +58,15 @@ class FraudDetectionService:
             'merchant': transaction.merchant,
             'location': transaction.location,
             'timestamp': transaction.timestamp.isoformat(),
-            'metadata': transaction.metadata or {}
+            'metadata': transaction.metadata or {},
+            'history': history,
+            'risk_profile': risk_profile
         }
         
         # Run agent analysis
         try:
-            analysis_result = self.agents.analyze_transaction(transaction_data)
+            with trace.step("agents"):
+                analysis_result = self.agents.analyze_transaction(transaction_data, trace)
             
             # Calculate processing time
             processing_time = int((time.time() - start_time) * 1000)
@@ -49,19 +78,25 @@ class FraudDetectionService:
                 confidence_score=analysis_result['confidence_score'],
                 risk_factors=analysis_result['risk_factors'],
                 agent_votes=analysis_result['agent_votes'],
-                processing_time_ms=processing_time
+                processing_time_ms=processing_time,
+                prompt_tokens=analysis_result.get('prompt_tokens'),
+                prompt_build_ms=analysis_result.get('prompt_build_ms')
             )
             
             # Store results in database
-            await self._store_analysis_result(transaction, prediction)
+            with trace.step("store"):
+                await self._store_analysis_result(transaction, prediction)
             
             return prediction
             
         except Exception as e:
             # Fallback simple analysis if agents fail
-            return self._fallback_analysis(transaction, start_time)
+            trace.error = f"{type(e).__name__}: {e}"
+            with trace.step("fallback"):
+                return self._fallback_analysis(transaction, start_time, risk_profile)
     
-    def _fallback_analysis(self, transaction: Transaction, start_time: float) -> FraudPrediction:
+    def _fallback_analysis(self, transaction: Transaction, start_time: float,
+                           risk_profile: Dict[str, Any] = None) -> FraudPrediction:
         """Simple fallback fraud detection if agents fail"""
         processing_time = int((time.time() - start_time) * 1000)
         
@@ -81,6 +116,13 @@ class FraudDetectionService:
         
         confidence = 0.6 if is_fraud else 0.3
         
+        # Merchant and location risk index check
+        if risk_profile:
+            risk_factors.extend(risk_profile['risk_factors'])
+            if risk_profile['known_bad']:
+                is_fraud = True
+                confidence = max(confidence, settings.FRAUD_THRESHOLD)
+        
         return FraudPrediction(
             transaction_id=transaction.transaction_id,
             is_fraud=is_fraud,
@@ -90,7 +132,43 @@ class FraudDetectionService:
             processing_time_ms=processing_time
         )
     
-    async def _store_analysis_result(self, transaction: Transaction, prediction: FraudPrediction):
+    def _get_user_history(self, user_id: str) -> list[Dict[str, Any]]:
+        """Get the user's most recent transactions for agent context"""
+        if settings.PROMPT_HISTORY_LIMIT <= 0:
+            return []
+        
+        try:
+            db = next(get_db())
+            rows = (
+                db.query(TransactionRecord, FraudAnalysisRecord.is_fraud)
+                .outerjoin(
+                    FraudAnalysisRecord,
+                    FraudAnalysisRecord.transaction_id == TransactionRecord.transaction_id
+                )
+                .filter(TransactionRecord.user_id == user_id)
+                .order_by(TransactionRecord.timestamp.desc())
+                .limit(settings.PROMPT_HISTORY_LIMIT)
+                .all()
+            )
+            db.close()
+        except Exception as e:
+            print(f"Database error: {e}")
+            return []
+        
+        return [
+            {
+                'timestamp': record.timestamp.isoformat(),
+                'transaction_type': record.transaction_type,
+                'amount': record.amount,
+                'merchant': record.merchant,
+                'location': record.location,
+                'is_fraud': is_fraud
+            }
+            for record, is_fraud in rows
+        ]
+    
+    async def _store_analysis_result(self, transaction: Transaction, prediction: FraudPrediction,
+                                     update_index: bool = True):
         """Store transaction and analysis result in database"""
         try:
             db = next(get_db())
@@ -123,6 +201,9 @@ class FraudDetectionService:
             db.commit()
             db.close()
             
+            if update_index:
+                self.risk_index.record(transaction.merchant, transaction.location, prediction.is_fraud)
+            
         except Exception as e:
             print(f"Database error: {e}")
     
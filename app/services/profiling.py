@@ -0,0 +1,125 @@
+"""
+Sampling profiler and slow request capture
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from app.config.settings import settings
+
+
+class SamplingProfiler:
+    """Low-overhead wall-clock profiler that samples every thread's stack
+
+    Output is in collapsed-stack format ("frame;frame;frame count" per line),
+    which flamegraph.pl and speedscope read directly.
+    """
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._lock.locked()
+
+    def profile(self, seconds):
+        """Sample all threads for the given duration and return collapsed stacks"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("Profiler is already running")
+
+        try:
+            own_thread = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_thread:
+                        stacks[self._collapse(frame)] += 1
+                time.sleep(self.interval)
+        finally:
+            self._lock.release()
+
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+
+    @staticmethod
+    def _collapse(frame):
+        """Turn a frame into a root-first, semicolon-separated stack"""
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+class RequestTrace:
+    """Per-step timing trace for a single request"""
+
+    def __init__(self, transaction_id):
+        self.transaction_id = transaction_id
+        self.started_at = datetime.now()
+        self.steps = []
+        self.total_ms = None
+        self.error = None
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def step(self, name):
+        """Time a block of work as a named step"""
+        step_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_step(name, (time.perf_counter() - step_start) * 1000)
+
+    def add_step(self, name, duration_ms):
+        """Record a step timed elsewhere"""
+        self.steps.append({'step': name, 'duration_ms': round(duration_ms, 3)})
+
+    def finish(self):
+        """Stop the trace clock"""
+        self.total_ms = round((time.perf_counter() - self._start) * 1000, 3)
+        return self
+
+    def to_dict(self):
+        return {
+            'transaction_id': self.transaction_id,
+            'started_at': self.started_at.isoformat(),
+            'total_ms': self.total_ms,
+            'steps': list(self.steps),
+            'error': self.error
+        }
+
+
+class SlowRequestLog:
+    """Bounded ring buffer of traces for requests over the slow threshold"""
+
+    def __init__(self, threshold_ms=None, size=None):
+        self.threshold_ms = settings.SLOW_REQUEST_MS if threshold_ms is None else threshold_ms
+        self._traces = deque(maxlen=settings.SLOW_REQUEST_BUFFER_SIZE if size is None else size)
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        """Keep the trace if the request was slow"""
+        if trace.total_ms is None or trace.total_ms < self.threshold_ms:
+            return False
+        with self._lock:
+            self._traces.append(trace.to_dict())
+        return True
+
+    def recent(self, limit=None):
+        """Get captured traces, newest first"""
+        with self._lock:
+            traces = list(reversed(self._traces))
+        return traces[:limit] if limit else traces
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
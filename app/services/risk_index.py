@@ -0,0 +1,204 @@
+"""
+Merchant and location risk index built from stored analyses
+"""
+
+import json
+import re
+import threading
+
+from app.database.database import get_db, TransactionRecord, FraudAnalysisRecord
+from app.config.settings import settings
+
+
+def normalize(value):
+    """Normalize a merchant or location string for lookups"""
+    if not value:
+        return ""
+    return re.sub(r"[^a-z0-9]+", " ", value.lower()).strip()
+
+
+class RiskIndex:
+    """In-memory fraud rate and volume per merchant, location and pair
+
+    Learned tables map a normalized key to a [fraud_count, total] pair so
+    lookups are plain dict reads. Only agent verdicts are counted; results
+    decided by the rule-based fallback would otherwise reinforce themselves.
+    Learned rates are context only: just the static risk list, which an
+    operator maintains, marks a merchant as known-bad.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.merchants = {}
+        self.locations = {}
+        self.pairs = {}
+        # Static risk list: normalized key -> fraud rate
+        self.listed_merchants = {}
+        self.listed_locations = {}
+        self.listed_pairs = {}
+
+    def build(self):
+        """Rebuild the index from the static list and stored transactions"""
+        merchants, locations, pairs = {}, {}, {}
+        listed_merchants, listed_locations, listed_pairs = self._load_static()
+
+        try:
+            db = next(get_db())
+            rows = (
+                db.query(
+                    TransactionRecord.merchant,
+                    TransactionRecord.location,
+                    FraudAnalysisRecord.is_fraud,
+                    FraudAnalysisRecord.agent_votes
+                )
+                .join(
+                    FraudAnalysisRecord,
+                    FraudAnalysisRecord.transaction_id == TransactionRecord.transaction_id
+                )
+                .all()
+            )
+            db.close()
+        except Exception as e:
+            print(f"Database error: {e}")
+            rows = []
+
+        for merchant, location, is_fraud, agent_votes in rows:
+            if self._is_fallback(agent_votes):
+                continue
+            self._add(merchants, locations, pairs, merchant, location, int(bool(is_fraud)), 1)
+
+        with self._lock:
+            self.merchants, self.locations, self.pairs = merchants, locations, pairs
+            self.listed_merchants = listed_merchants
+            self.listed_locations = listed_locations
+            self.listed_pairs = listed_pairs
+
+    def record(self, merchant, location, is_fraud):
+        """Add a single stored analysis to the index"""
+        with self._lock:
+            self._add(self.merchants, self.locations, self.pairs,
+                      merchant, location, int(bool(is_fraud)), 1)
+
+    def lookup(self, merchant, location):
+        """Get risk stats for a merchant, location and their pair"""
+        merchant_key = normalize(merchant)
+        location_key = normalize(location)
+
+        pair_key = (merchant_key, location_key)
+
+        profile = {
+            'merchant': self._stats(self.merchants.get(merchant_key)),
+            'location': self._stats(self.locations.get(location_key)),
+            'pair': self._stats(self.pairs.get(pair_key)),
+            'listed': {
+                'merchant': self.listed_merchants.get(merchant_key),
+                'location': self.listed_locations.get(location_key),
+                'pair': self.listed_pairs.get(pair_key)
+            }
+        }
+
+        risk_factors = []
+        listed = {}
+        for key, label in [('merchant', "High-risk merchant"),
+                           ('location', "High-risk location"),
+                           ('pair', "High-risk merchant at this location")]:
+            listed[key] = self._is_listed(profile['listed'][key])
+            if listed[key] or self._is_high_risk(profile[key]):
+                risk_factors.append(label)
+
+        profile['risk_factors'] = risk_factors
+        # Only listed merchants decide without the agents; a risky location
+        # alone, or a learned rate, is context for the agents
+        profile['known_bad'] = listed['merchant'] or listed['pair']
+        return profile
+
+    def _load_static(self):
+        """Load the optional static risk list
+
+        The file is a JSON list of entries with a "merchant", a "location"
+        or both, and a "fraud_rate". An entry with both only applies to that
+        merchant at that location.
+        """
+        merchants, locations, pairs = {}, {}, {}
+        if not settings.RISK_INDEX_STATIC_PATH:
+            return merchants, locations, pairs
+
+        try:
+            with open(settings.RISK_INDEX_STATIC_PATH) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Risk index error: {e}")
+            return merchants, locations, pairs
+
+        if not isinstance(entries, list):
+            print("Risk index error: static risk list must be a JSON list")
+            return merchants, locations, pairs
+
+        for entry in entries:
+            try:
+                merchant_key = normalize(entry.get('merchant'))
+                location_key = normalize(entry.get('location'))
+                fraud_rate = float(entry['fraud_rate'])
+                if not 0 <= fraud_rate <= 1:
+                    raise ValueError("fraud_rate must be between 0 and 1")
+                if not merchant_key and not location_key:
+                    raise ValueError("merchant or location is required")
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Risk index error: skipping static entry {entry!r}: {e}")
+                continue
+
+            if merchant_key and location_key:
+                pairs[(merchant_key, location_key)] = fraud_rate
+            elif merchant_key:
+                merchants[merchant_key] = fraud_rate
+            else:
+                locations[location_key] = fraud_rate
+
+        return merchants, locations, pairs
+
+    @staticmethod
+    def _add(merchants, locations, pairs, merchant, location, fraud, total):
+        """Add fraud and total counts to every matching table"""
+        merchant_key = normalize(merchant)
+        location_key = normalize(location)
+        keys = []
+        if merchant_key:
+            keys.append((merchants, merchant_key))
+        if location_key:
+            keys.append((locations, location_key))
+        if merchant_key and location_key:
+            keys.append((pairs, (merchant_key, location_key)))
+
+        for table, key in keys:
+            counts = table.setdefault(key, [0, 0])
+            counts[0] += fraud
+            counts[1] += total
+
+    @staticmethod
+    def _is_fallback(agent_votes):
+        """Check if a stored result came from the rule-based fallback"""
+        try:
+            return "fallback" in json.loads(agent_votes or "{}")
+        except (TypeError, ValueError):
+            return False
+
+    @staticmethod
+    def _stats(counts):
+        """Convert raw counts to fraud rate and volume"""
+        if not counts or not counts[1]:
+            return None
+        return {'fraud_rate': counts[0] / counts[1], 'volume': counts[1]}
+
+    @staticmethod
+    def _is_listed(fraud_rate):
+        """Check if a static risk list rate passes the configured fraud rate"""
+        return fraud_rate is not None and fraud_rate >= settings.RISK_INDEX_FRAUD_RATE
+
+    @staticmethod
+    def _is_high_risk(stats):
+        """Check if stats pass the configured volume and fraud rate"""
+        return (
+            stats is not None
+            and stats['volume'] >= settings.RISK_INDEX_MIN_VOLUME
+            and stats['fraud_rate'] >= settings.RISK_INDEX_FRAUD_RATE
+        )
@@ -7,7 +7,7 @@ from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
 from app.config.settings import settings
-from app.api.routes import router
+from app.api.routes import router, fraud_service
 from app.database.database import create_tables
 
 # Create FastAPI app
@@ -36,6 +36,8 @@ async def startup_event():
     print("🚀 Starting Fraud Detection System...")
     create_tables()
     print("✅ Database initialized")
+    fraud_service.risk_index.build()
+    print("✅ Risk index built")
     print(f"🔍 Fraud threshold set to: {settings.FRAUD_THRESHOLD}")
 
 
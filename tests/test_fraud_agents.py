@@ -0,0 +1,115 @@
+"""
+Tests for the fraud detection agents' parsing and task timing
+"""
+
+import time
+
+import pytest
+from crewai.crews.crew_output import CrewOutput
+from crewai.tasks.task_output import TaskOutput
+
+from app.agents.fraud_agents import FraudDetectionAgents
+from app.services.profiling import RequestTrace
+
+
+@pytest.fixture
+def agents():
+    # Parsing only needs the task names, not real agents or an LLM
+    agents = FraudDetectionAgents.__new__(FraudDetectionAgents)
+    agents.tasks = dict.fromkeys(['amount', 'behavior', 'location', 'risk'])
+    return agents
+
+
+def make_output(amount, behavior, location, risk):
+    tasks_output = [
+        TaskOutput(description=name, raw=raw, agent=name)
+        for name, raw in [('amount', amount), ('behavior', behavior),
+                          ('location', location), ('risk', risk)]
+    ]
+    return CrewOutput(raw=risk, tasks_output=tasks_output)
+
+
+def test_legitimate_verdict_mentioning_fraud(agents):
+    output = make_output(
+        "NORMAL: amount is typical", "NORMAL", "NORMAL",
+        "Final verdict: LEGITIMATE. No indicators of fraud.\nConfidence score (0-1): 0.15"
+    )
+
+    result = agents._process_results(output)
+
+    assert not result['is_fraud']
+    assert result['confidence_score'] == 0.15
+    assert result['agent_votes'] == {
+        "amount_agent": False, "behavior_agent": False,
+        "location_agent": False, "risk_agent": False
+    }
+
+
+def test_fraud_verdict_with_risk_factors(agents):
+    output = make_output(
+        "SUSPICIOUS: far above usual spend", "NORMAL", "suspicious merchant",
+        "Final verdict: FRAUD\n"
+        "Confidence score: 92%\n"
+        "Key risk factors:\n"
+        "- Amount far above user's average\n"
+        "- High-risk merchant\n"
+        "\n"
+        "Recommend declining."
+    )
+
+    result = agents._process_results(output)
+
+    assert result['is_fraud']
+    assert result['confidence_score'] == 0.92
+    assert result['risk_factors'] == ["Amount far above user's average", "High-risk merchant"]
+    assert result['agent_votes']['amount_agent']
+    assert not result['agent_votes']['behavior_agent']
+    assert result['agent_votes']['location_agent']
+
+
+def test_verdict_without_label_uses_upper_case_word(agents):
+    output = make_output("NORMAL", "NORMAL", "NORMAL", "LEGITIMATE - fraud is unlikely")
+
+    result = agents._process_results(output)
+
+    assert not result['is_fraud']
+    assert result['confidence_score'] == 0.2
+
+
+def test_missing_verdict_raises(agents):
+    output = make_output("NORMAL", "NORMAL", "NORMAL", "I could not decide whether this is fraud.")
+
+    with pytest.raises(ValueError):
+        agents._process_results(output)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Confidence score (0-1): 0.85", 0.85),
+    ("Confidence: 70%", 0.7),
+    ("Confidence: 1", 1.0),
+    ("Confidence: high", None),
+    ("Confidence: 7", None),
+    ("no score here", None),
+])
+def test_parse_confidence(text, expected):
+    assert FraudDetectionAgents._parse_confidence(text) == expected
+
+
+def test_task_callbacks_record_one_step_per_task(agents):
+    trace = RequestTrace("txn_1")
+    agents._trace, agents._task_clock = trace, time.perf_counter()
+
+    for name in ['amount', 'behavior', 'location', 'risk']:
+        time.sleep(0.005)
+        agents._on_task_done(name, None)
+
+    assert [step['step'] for step in trace.steps] == [
+        "agents.amount", "agents.behavior", "agents.location", "agents.risk"
+    ]
+    assert all(step['duration_ms'] >= 5 for step in trace.steps)
+
+
+def test_task_callbacks_without_trace(agents):
+    agents._trace, agents._task_clock = None, None
+
+    agents._on_task_done('amount', None)
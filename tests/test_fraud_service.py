@@ -0,0 +1,87 @@
+"""
+Tests for the rule-based parts of the fraud detection service
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.config.settings import settings
+from app.models.schemas import Transaction, TransactionType
+from app.services.fraud_service import FraudDetectionService
+from app.services.profiling import SlowRequestLog
+from app.services.risk_index import RiskIndex
+
+
+@pytest.fixture
+def service():
+    # The rule-based checks don't need the agents
+    return FraudDetectionService.__new__(FraudDetectionService)
+
+
+def make_transaction(amount=50.0):
+    return Transaction(
+        transaction_id="txn_1",
+        user_id="user_123",
+        amount=amount,
+        transaction_type=TransactionType.PURCHASE,
+        merchant="Shady Shop",
+        location="New York, NY",
+        timestamp=datetime.now()
+    )
+
+
+def make_profile(risk_factors, known_bad):
+    return {'merchant': None, 'location': None, 'pair': None,
+            'risk_factors': risk_factors, 'known_bad': known_bad}
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7, 0.95])
+def test_known_bad_merchant_is_not_approved(service, monkeypatch, threshold):
+    monkeypatch.setattr(settings, "FRAUD_THRESHOLD", threshold)
+    profile = make_profile(["High-risk merchant"], known_bad=True)
+
+    prediction = service._fallback_analysis(make_transaction(), 0.0, profile)
+    action, _ = service.get_fraud_decision(prediction)
+
+    assert prediction.is_fraud
+    assert "High-risk merchant" in prediction.risk_factors
+    assert action == "decline"
+
+
+def test_risky_location_alone_does_not_mark_fraud(service):
+    profile = make_profile(["High-risk location"], known_bad=False)
+
+    prediction = service._fallback_analysis(make_transaction(), 0.0, profile)
+
+    assert not prediction.is_fraud
+    assert prediction.risk_factors == ["High-risk location"]
+
+
+def test_fallback_without_profile(service):
+    prediction = service._fallback_analysis(make_transaction(amount=20000.0), 0.0)
+
+    assert prediction.is_fraud
+    assert prediction.agent_votes == {"fallback": True}
+
+
+class FailingAgents:
+    def analyze_transaction(self, transaction_data, trace=None):
+        raise RuntimeError("LLM unavailable")
+
+
+def test_agent_failure_is_recorded_on_trace(service, monkeypatch):
+    monkeypatch.setattr(settings, "PROMPT_HISTORY_LIMIT", 0)
+    service.agents = FailingAgents()
+    service.risk_index = RiskIndex()
+    service.slow_requests = SlowRequestLog(threshold_ms=0, size=10)
+
+    prediction = asyncio.run(service.analyze_transaction(make_transaction()))
+
+    assert prediction.agent_votes == {"fallback": False}
+    trace = service.slow_requests.recent()[0]
+    assert trace['error'] == "RuntimeError: LLM unavailable"
+    assert [step['step'] for step in trace['steps']] == [
+        "risk_index", "history", "agents", "fallback"
+    ]
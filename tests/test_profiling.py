@@ -0,0 +1,104 @@
+"""
+Tests for the sampling profiler and slow request capture
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.services.profiling import SamplingProfiler, RequestTrace, SlowRequestLog
+
+
+def make_trace(transaction_id, total_ms):
+    trace = RequestTrace(transaction_id)
+    trace.add_step("agents", total_ms)
+    trace.total_ms = total_ms
+    return trace
+
+
+def test_trace_records_steps():
+    trace = RequestTrace("txn_1")
+    with trace.step("store"):
+        time.sleep(0.01)
+    trace.finish()
+
+    data = trace.to_dict()
+    assert data['transaction_id'] == "txn_1"
+    assert data['steps'][0]['step'] == "store"
+    assert data['steps'][0]['duration_ms'] >= 10
+    assert data['total_ms'] >= data['steps'][0]['duration_ms']
+    assert data['error'] is None
+
+
+def test_trace_records_step_on_error():
+    trace = RequestTrace("txn_1")
+    with pytest.raises(ValueError):
+        with trace.step("agents"):
+            raise ValueError("boom")
+
+    assert [step['step'] for step in trace.steps] == ["agents"]
+
+
+def test_slow_log_keeps_only_slow_requests():
+    log = SlowRequestLog(threshold_ms=100, size=10)
+
+    assert not log.record(make_trace("fast", 99))
+    assert log.record(make_trace("slow", 100))
+    assert [t['transaction_id'] for t in log.recent()] == ["slow"]
+
+
+def test_slow_log_ignores_unfinished_trace():
+    log = SlowRequestLog(threshold_ms=0, size=10)
+
+    assert not log.record(RequestTrace("txn_1"))
+
+
+def test_slow_log_is_bounded_and_newest_first():
+    log = SlowRequestLog(threshold_ms=0, size=3)
+    for i in range(5):
+        log.record(make_trace(str(i), 10))
+
+    assert [t['transaction_id'] for t in log.recent()] == ["4", "3", "2"]
+    assert [t['transaction_id'] for t in log.recent(limit=1)] == ["4"]
+
+    log.clear()
+    assert log.recent() == []
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_profiler_returns_collapsed_stacks():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_loop, args=(stop,))
+    worker.start()
+    try:
+        output = SamplingProfiler(interval=0.005).profile(0.2)
+    finally:
+        stop.set()
+        worker.join()
+
+    lines = output.splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+    assert any("busy_loop (test_profiling.py" in line for line in lines)
+
+
+def test_profiler_runs_one_profile_at_a_time():
+    profiler = SamplingProfiler()
+    thread = threading.Thread(target=profiler.profile, args=(0.3,))
+    thread.start()
+    time.sleep(0.05)
+    try:
+        assert profiler.running
+        with pytest.raises(RuntimeError):
+            profiler.profile(0.1)
+    finally:
+        thread.join()
+
+    assert not profiler.running
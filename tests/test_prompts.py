@@ -0,0 +1,81 @@
+"""
+Tests for agent prompt templates
+"""
+
+from app.agents.prompts import PromptTemplate, LOCATION_PROMPT, estimate_tokens
+
+
+VALUES = {
+    'amount': 15000.0,
+    'transaction_type': 'purchase',
+    'user_id': 'user_123',
+    'timestamp': '2026-01-01T12:00:00',
+    'location': 'New York, NY',
+    'merchant': 'Online Store'
+}
+
+
+def make_template():
+    return PromptTemplate(
+        "test",
+        """
+        Analyze {user_id}
+        """,
+        sections=[
+            (2, "metadata", "Metadata"),
+            (1, "history", "History"),
+        ]
+    )
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("abcde") == 2
+
+
+def test_render_includes_sections_in_priority_order():
+    prompt = make_template().render(
+        VALUES, {'history': ["h1"], 'metadata': ["ip: 1.2.3.4"]}, token_budget=1000
+    )
+
+    assert prompt.startswith("Analyze user_123")
+    assert prompt.index("History:") < prompt.index("Metadata:")
+    assert "- h1" in prompt
+    assert "- ip: 1.2.3.4" in prompt
+
+
+def test_render_skips_empty_sections():
+    prompt = make_template().render(VALUES, {'history': []}, token_budget=1000)
+
+    assert prompt == "Analyze user_123"
+
+
+def test_render_trims_to_budget():
+    history = [f"transaction number {i} at some merchant" for i in range(50)]
+    context = {'history': history, 'metadata': ["device: mobile"]}
+
+    for budget in (20, 50, 100, 200):
+        prompt = make_template().render(VALUES, context, token_budget=budget)
+        assert estimate_tokens(prompt) <= budget
+
+    # Higher priority lines are kept first and in order
+    prompt = make_template().render(VALUES, context, token_budget=50)
+    assert "- transaction number 0 at some merchant" in prompt
+    assert "- transaction number 49 at some merchant" not in prompt
+    assert "Metadata:" not in prompt
+
+
+def test_render_keeps_body_when_over_budget():
+    prompt = make_template().render(VALUES, {'history': ["h1"]}, token_budget=1)
+
+    assert prompt == "Analyze user_123"
+
+
+def test_location_prompt_puts_risk_index_first():
+    context = {'risk_index': ["Merchant: 80% fraud rate over 10 transactions"],
+               'history': ["h1"]}
+    prompt = LOCATION_PROMPT.render(VALUES, context, token_budget=1000)
+
+    assert "Location: New York, NY" in prompt
+    assert prompt.index("Known merchant and location risk:") < prompt.index("Recent transactions")
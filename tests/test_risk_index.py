@@ -0,0 +1,195 @@
+"""
+Tests for the merchant and location risk index
+"""
+
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config.settings import settings
+from app.database.database import Base, TransactionRecord, FraudAnalysisRecord
+from app.services import risk_index as risk_index_module
+from app.services.risk_index import RiskIndex, normalize
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(settings, "RISK_INDEX_FRAUD_RATE", 0.5)
+    monkeypatch.setattr(settings, "RISK_INDEX_MIN_VOLUME", 5)
+    monkeypatch.setattr(settings, "RISK_INDEX_STATIC_PATH", "")
+
+
+@pytest.fixture
+def db_session(monkeypatch):
+    """Point the index at an empty in-memory database"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.setattr(risk_index_module, "get_db", get_db)
+    return Session
+
+
+def store(Session, transaction_id, merchant, location, is_fraud, agent_votes):
+    db = Session()
+    db.add(TransactionRecord(
+        transaction_id=transaction_id, user_id="user_123", amount=100.0,
+        transaction_type="purchase", merchant=merchant, location=location,
+        timestamp=datetime.now()
+    ))
+    db.add(FraudAnalysisRecord(
+        transaction_id=transaction_id, is_fraud=is_fraud, confidence_score=0.8,
+        risk_factors="[]", agent_votes=json.dumps(agent_votes),
+        processing_time_ms=10, timestamp=datetime.now()
+    ))
+    db.commit()
+    db.close()
+
+
+def write_static(tmp_path, monkeypatch, entries):
+    path = tmp_path / "static_risk.json"
+    path.write_text(json.dumps(entries))
+    monkeypatch.setattr(settings, "RISK_INDEX_STATIC_PATH", str(path))
+
+
+def test_normalize():
+    assert normalize("  Shady Shop!! ") == "shady shop"
+    assert normalize("New York, NY") == "new york ny"
+    assert normalize(None) == ""
+
+
+def test_unknown_merchant_is_not_known_bad():
+    profile = RiskIndex().lookup("Other", "Boston")
+
+    assert profile['merchant'] is None
+    assert profile['risk_factors'] == []
+    assert not profile['known_bad']
+
+
+def test_learned_rate_is_context_not_known_bad():
+    index = RiskIndex()
+    for i in range(6):
+        index.record("Shady Shop!", "New York, NY", is_fraud=i < 4)
+
+    profile = index.lookup("shady  shop", "new york ny")
+
+    assert profile['merchant'] == {'fraud_rate': 4 / 6, 'volume': 6}
+    assert "High-risk merchant" in profile['risk_factors']
+    assert not profile['known_bad']
+
+
+def test_below_min_volume_is_not_a_risk_factor():
+    index = RiskIndex()
+    for _ in range(4):
+        index.record("Shady Shop", "Boston", is_fraud=True)
+
+    assert index.lookup("Shady Shop", "Boston")['risk_factors'] == []
+
+
+def test_listed_merchant_is_known_bad(tmp_path, monkeypatch, db_session):
+    write_static(tmp_path, monkeypatch, [
+        {"merchant": "Shady Electronics", "fraud_rate": 0.9}
+    ])
+    index = RiskIndex()
+    index.build()
+
+    profile = index.lookup("shady electronics", "Anywhere")
+
+    assert profile['listed']['merchant'] == 0.9
+    assert profile['risk_factors'] == ["High-risk merchant"]
+    assert profile['known_bad']
+
+
+def test_listed_rate_at_threshold_is_known_bad(tmp_path, monkeypatch, db_session):
+    write_static(tmp_path, monkeypatch, [{"merchant": "Edge", "fraud_rate": 0.5}])
+    index = RiskIndex()
+    index.build()
+
+    assert index.lookup("Edge", None)['known_bad']
+
+
+def test_listed_pair_only_applies_at_that_location(tmp_path, monkeypatch, db_session):
+    write_static(tmp_path, monkeypatch, [
+        {"merchant": "Corner Cafe", "location": "Lagos", "fraud_rate": 0.9}
+    ])
+    index = RiskIndex()
+    index.build()
+
+    assert index.lookup("Corner Cafe", "Lagos")['known_bad']
+    assert index.lookup("Corner Cafe", "Lagos")['risk_factors'] == [
+        "High-risk merchant at this location"
+    ]
+    assert not index.lookup("Corner Cafe", "Paris")['known_bad']
+    assert not index.lookup("Other Shop", "Lagos")['known_bad']
+
+
+def test_listed_location_alone_is_not_known_bad(tmp_path, monkeypatch, db_session):
+    write_static(tmp_path, monkeypatch, [{"location": "Nowhere", "fraud_rate": 0.9}])
+    index = RiskIndex()
+    index.build()
+
+    profile = index.lookup("Corner Cafe", "nowhere")
+
+    assert profile['risk_factors'] == ["High-risk location"]
+    assert not profile['known_bad']
+
+
+@pytest.mark.parametrize("content", [
+    [{"merchant": "X"}],
+    [{"merchant": "X", "fraud_rate": "high"}],
+    [{"merchant": "X", "fraud_rate": 2}],
+    [{"fraud_rate": 0.9}],
+    ["X"],
+    {"X": 0.9},
+])
+def test_bad_static_entries_are_skipped(tmp_path, monkeypatch, content):
+    write_static(tmp_path, monkeypatch, content)
+
+    assert RiskIndex()._load_static() == ({}, {}, {})
+
+
+def test_bad_static_entry_does_not_drop_good_ones(tmp_path, monkeypatch):
+    write_static(tmp_path, monkeypatch, [
+        {"merchant": "X"},
+        {"merchant": "Y", "fraud_rate": 0.8}
+    ])
+
+    merchants, _, _ = RiskIndex()._load_static()
+
+    assert merchants == {"y": 0.8}
+
+
+def test_build_counts_agent_verdicts_only(db_session):
+    for i in range(5):
+        store(db_session, f"agent-{i}", "Shop", "Boston", False, {"risk_agent": False})
+    for i in range(10):
+        store(db_session, f"fallback-{i}", "Shop", "Boston", True, {"fallback": True})
+
+    index = RiskIndex()
+    index.build()
+
+    assert index.lookup("Shop", "Boston")['merchant'] == {'fraud_rate': 0.0, 'volume': 5}
+
+
+def test_build_without_tables_leaves_index_empty(monkeypatch):
+    engine = create_engine("sqlite://")
+    Session = sessionmaker(bind=engine)
+
+    def get_db():
+        yield Session()
+
+    monkeypatch.setattr(risk_index_module, "get_db", get_db)
+    index = RiskIndex()
+    index.build()
+
+    assert index.merchants == {}